@@ -1,10 +1,55 @@
 from abc import ABC, abstractmethod
+import time
 
-from pyvisa import ResourceManager 
+from pyvisa import ResourceManager
+from pyvisa.errors import InvalidSession, VisaIOError
 from pyvisa.resources import MessageBasedResource
 import numpy as np
 
+class RetryPolicy:
+    '''
+    Bounds the time spent on a single device call.
+
+    deadline: maximum time for one call including all retries, in seconds
+    (None for no bound). Running attempts are cut short where the backend
+    supports it, see Device.limit_attempt
+    retries: number of additional attempts after the first failure
+    backoff: delay before the first retry, in seconds
+    backoff_factor: multiplier applied to the delay after each retry
+    reopen: True if the backend should be reopened before retrying
+    '''
+
+    def __init__(self, deadline=10., retries=3, backoff=.05,
+                 backoff_factor=2., reopen=True):
+        self.deadline = deadline
+        self.retries = retries
+        self.backoff = backoff
+        self.backoff_factor = backoff_factor
+        self.reopen = reopen
+
+
+class FailureStats:
+    '''
+    Failure counters of a device, for schedulers deciding where to
+    route work.
+    '''
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.retries = 0
+        self.reopens = 0
+        self.deadlines_exceeded = 0
+        self.consecutive_failures = 0
+        self.last_error = None
+
+    def as_dict(self) -> dict:
+        return dict(vars(self))
+
+
 class Device(ABC):
+    # exceptions which are retried by call_with_retries
+    retry_errors: tuple = ()
 
     @property
     @abstractmethod
@@ -17,32 +62,178 @@ class Device(ABC):
         '''Closes the backend to avoid hanging processes.'''
         pass
 
+    def reopen(self) -> None:
+        '''override this if the backend can be reopened after a fault'''
+        pass
+
+    @property
+    def retry_policy(self) -> RetryPolicy:
+        '''
+        Deadline and retry settings used by call_with_retries.
+        '''
+        try:
+            return self._retry_policy
+        except AttributeError:
+            self._retry_policy = RetryPolicy()
+            return self._retry_policy
+
+    @retry_policy.setter
+    def retry_policy(self, policy: RetryPolicy) -> None:
+        self._retry_policy = policy
+
+    @property
+    def failure_stats(self) -> FailureStats:
+        '''
+        Counters of failed, retried and reopened calls.
+        '''
+        try:
+            return self._failure_stats
+        except AttributeError:
+            self._failure_stats = FailureStats()
+            return self._failure_stats
+
+    def limit_attempt(self, timeout) -> None:
+        '''
+        override this if the backend can bound a single call.
+
+        timeout: maximum time for the next backend call, in seconds, or
+        None to restore the backend default
+        '''
+        pass
+
+    def call_with_retries(self, func, *args, **kwargs):
+        '''
+        Calls func(*args, **kwargs), retrying on self.retry_errors with
+        exponential backoff and reopening the backend between attempts,
+        as set by self.retry_policy.
+
+        Each attempt is capped at the time left before the deadline
+        through limit_attempt. Backends which do not implement it are
+        only bounded by their own timeout within a running attempt.
+
+        returns: the return value of func
+        raises: DeviceTimeoutException if the deadline is exceeded or the
+        retries are exhausted
+        '''
+        policy = self.retry_policy
+        stats = self.failure_stats
+        stats.calls += 1
+        start = time.monotonic()
+        delay = policy.backoff
+        attempt = 0
+        error = None
+        try:
+            while True:
+                try:
+                    if policy.deadline is not None:
+                        remaining = policy.deadline - (time.monotonic() - start)
+                        if remaining <= 0:
+                            stats.deadlines_exceeded += 1
+                            raise DeviceTimeoutException(
+                                f"{self.__class__.__name__}: call exceeded deadline of "
+                                f"{policy.deadline} s") from error
+                        self.limit_attempt(remaining)
+                    result = func(*args, **kwargs)
+                except self.retry_errors as err:
+                    error = err
+                    stats.failures += 1
+                    stats.consecutive_failures += 1
+                    stats.last_error = err
+                    elapsed = time.monotonic() - start
+                    if attempt >= policy.retries:
+                        raise DeviceTimeoutException(
+                            f"{self.__class__.__name__}: call failed after "
+                            f"{attempt + 1} attempts ({err})") from err
+                    if policy.deadline is not None and elapsed + delay > policy.deadline:
+                        stats.deadlines_exceeded += 1
+                        raise DeviceTimeoutException(
+                            f"{self.__class__.__name__}: call exceeded deadline of "
+                            f"{policy.deadline} s ({err})") from err
+                else:
+                    stats.consecutive_failures = 0
+                    return result
+                attempt += 1
+                stats.retries += 1
+                time.sleep(delay)
+                delay *= policy.backoff_factor
+                if policy.reopen:
+                    try:
+                        self.reopen()
+                        stats.reopens += 1
+                    except self.retry_errors as err:
+                        stats.last_error = err
+        finally:
+            if policy.deadline is not None:
+                try:
+                    self.limit_attempt(None)
+                except self.retry_errors:
+                    pass
+
 
 class PyvisaDevice(Device):
+    # InvalidSession is raised once a resource is closed, e.g. after a
+    # failed reopen, and is cleared by reopening it again
+    retry_errors = (VisaIOError, InvalidSession)
+
     def __init__(self, resource_address):
+        self.resource_address = resource_address
         self.resource: MessageBasedResource = ResourceManager().open_resource(resource_address)
-    
-    @property 
+
+    @property
     def idn(self):
         return self.query("*IDN?")
 
     def query(self, message) -> str:
-        return self.resource.query(message) 
-    
+        return self.call_with_retries(lambda: self.resource.query(message))
+
     def query_list(self,message) -> np.ndarray:
         response = self.query(message)
         return np.array([float(x.strip()) for x in response.split(',')])
 
     def read(self) -> str:
-        return self.resource.read()
+        return self.call_with_retries(lambda: self.resource.read())
 
     def write(self, message):
-        self.resource.write(message) 
+        self.call_with_retries(lambda: self.resource.write(message))
+
+    def reopen(self):
+        # open the new session first, so a failed reopen leaves the
+        # current resource in place
+        resource = ResourceManager().open_resource(self.resource_address)
+        try:
+            self.resource.close()
+        except self.retry_errors:
+            pass
+        self.resource = resource
+
+    def limit_attempt(self, timeout):
+        # pyvisa timeouts are in milliseconds, None waits forever. The
+        # timeout set before the call is restored after it.
+        if timeout is None:
+            try:
+                saved = self._saved_timeout
+            except AttributeError:
+                return
+            del self._saved_timeout
+            self.resource.timeout = saved
+            return
+        try:
+            saved = self._saved_timeout
+        except AttributeError:
+            saved = self._saved_timeout = self.resource.timeout
+        if saved is None:
+            self.resource.timeout = timeout * 1e3
+        else:
+            self.resource.timeout = min(saved, timeout * 1e3)
 
     def close(self):
-        self.resource.close() 
-        
+        self.resource.close()
+
 
 class DeviceCommsException(Exception):
     def __init__(self, message):
         self.message = message
+
+
+class DeviceTimeoutException(DeviceCommsException):
+    pass
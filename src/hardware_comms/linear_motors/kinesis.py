@@ -14,6 +14,7 @@ class ThorlabsKinesisMotor(LinearMotor):
     '''
     Instantiate by the serial number of the control module
     '''
+    retry_errors = (ThorlabsError,)
 
     def __init__(self, how='first', serial_no=None):
         # auto-detect stage step -> distance calibration
@@ -33,18 +34,12 @@ class ThorlabsKinesisMotor(LinearMotor):
 
     @property
     def position(self):
-        # default units are (m)
-        try:
-            self._position = self.motor.get_position()
-        except ThorlabsError:
-            pass
+        # default units are (m); retried calls use self.motor as reopened
+        self._position = self.call_with_retries(lambda: self.motor.get_position())
         return self._position
 
     def is_in_motion(self) -> bool:
-        try:
-            return self.motor.is_moving()
-        except ThorlabsError:
-            return True
+        return self.call_with_retries(lambda: self.motor.is_moving())
 
     def move_abs(self, loc: float):
         if not (self.travel_limits[0] <= loc <= self.travel_limits[1]):
@@ -52,35 +47,35 @@ class ThorlabsKinesisMotor(LinearMotor):
                 "Location would exceed software limits")
         else:
             # default units are (m)
-            try:
-                self.motor.move_to(loc, scale=True)
-            except ThorlabsError:
-                pass
+            self.call_with_retries(
+                lambda: self.motor.move_to(loc, scale=True))
 
     def move_by(self, dist):
         # move the motor to the new position and update the position in micron
-        if not (self.travel_limits[0] <= (dist + self.position) <= self.travel_limits[1]):
+        target = dist + self.position
+        if not (self.travel_limits[0] <= target <= self.travel_limits[1]):
             raise StageOutOfBoundsException(
                 "Location would exceed software limits")
         else:
-            try:
-                self.motor.move_by(distance=dist)
-            except ThorlabsError:
-                pass
+            # sent as an absolute move, so a retried command cannot move
+            # the stage by dist more than once
+            self.call_with_retries(
+                lambda: self.motor.move_to(target, scale=True))
     # def wait_move_finish(self, interval):
         # self.motor.wait_move()
 
     def stop(self, blocking=True) -> None:
-        try:
-            self.motor.stop(sync=blocking)
-        except ThorlabsError:
-            pass
+        self.call_with_retries(lambda: self.motor.stop(sync=blocking))
 
     def home(self, blocking=False) -> None:
+        self.call_with_retries(lambda: self.motor.home(sync=blocking))
+
+    def reopen(self) -> None:
         try:
-            self.motor.home(sync=blocking)
+            self.motor.close()
         except ThorlabsError:
             pass
+        self.motor = KinesisMotor(self._idn, scale="stage")
 
     def close(self) -> None:
         self.motor.close()
@@ -0,0 +1,218 @@
+from .linear_motor import LinearMotor, StageOutOfBoundsException
+from ..devices import Device
+
+from itertools import permutations
+from time import sleep
+import numpy as np
+
+'''
+Coordinated moves of several linear motors, e.g. the axes of an XY(Z)
+stage, and planning of raster scans over them.
+'''
+
+
+class MotorGroup(Device):
+    '''
+    Commands a group of linear motors together. Moves are started on all
+    axes before waiting on any of them, and software limits are checked
+    for every axis (and every point of a scan) before anything moves.
+
+    motors: LinearMotor for each axis, in the column order of positions
+    '''
+
+    def __init__(self, motors: list[LinearMotor]):
+        self.motors = list(motors)
+
+    @property
+    def idn(self):
+        return ', '.join(str(motor.idn) for motor in self.motors)
+
+    @property
+    def position(self) -> np.ndarray:
+        '''
+        returns: location of each axis, in meters
+        '''
+        return np.array([motor.position for motor in self.motors])
+
+    @property
+    def travel_limits(self) -> np.ndarray:
+        '''
+        returns: 2DArray of (lower bound, upper bound) for each axis, in meters
+        raises: StageLimitsNotSetException if any axis has no limits
+        '''
+        return np.array([motor.travel_limits for motor in self.motors], dtype=np.float64)
+
+    def check_limits(self, points) -> None:
+        '''
+        Checks positions against the software limits of every axis.
+
+        points: position, or 2DArray of positions (points x axes), in meters
+        raises: StageOutOfBoundsException if any point is out of bounds
+        '''
+        points = np.atleast_2d(points)
+        limits = self.travel_limits
+        outside = (points < limits[:, 0]) | (points > limits[:, 1])
+        if outside.any():
+            point, axis = np.argwhere(outside)[0]
+            raise StageOutOfBoundsException(
+                f"Point {point} would exceed software limits of axis {axis}")
+
+    def _check_axes(self, values, name, ndim=1) -> None:
+        shape = np.shape(values)
+        if len(shape) != ndim or shape[-1] != len(self.motors):
+            raise ValueError(f"{name} of shape {shape} does not match "
+                             f"{len(self.motors)} axes")
+
+    def move_abs(self, position) -> None:
+        '''
+        Starts a move of all axes to an absolute location.
+
+        position: desired location of each axis, in meters
+        raises: ValueError if position does not have one entry per axis
+        raises: StageOutOfBoundsException if any axis would exceed its limits
+        '''
+        self._check_axes(position, 'position')
+        self.check_limits(position)
+        try:
+            for motor, value in zip(self.motors, position):
+                motor.move_abs(value)
+        except Exception:
+            # do not leave the axes already commanded moving
+            self.stop(blocking=False)
+            raise
+
+    def move_by(self, distance) -> None:
+        '''
+        Starts a relative move of all axes.
+
+        distance: distance of relative move for each axis, in meters
+        raises: ValueError if distance does not have one entry per axis
+        raises: StageOutOfBoundsException if any axis would exceed its limits
+        '''
+        self._check_axes(distance, 'distance')
+        self.check_limits(self.position + np.asarray(distance))
+        try:
+            for motor, value in zip(self.motors, distance):
+                motor.move_by(value)
+        except Exception:
+            self.stop(blocking=False)
+            raise
+
+    def is_in_motion(self) -> bool:
+        return any(motor.is_in_motion() for motor in self.motors)
+
+    def wait_move_finish(self, interval) -> None:
+        '''
+        Waits until every axis has stopped, only polling axes which were
+        still moving.
+        '''
+        moving = list(self.motors)
+        while moving:
+            moving = [motor for motor in moving if motor.is_in_motion()]
+            if moving:
+                sleep(interval)
+
+    def home(self, blocking=False) -> None:
+        for motor in self.motors:
+            motor.home(blocking=False)
+        if blocking:
+            self.wait_move_finish(.05)
+
+    def stop(self, blocking=True) -> None:
+        '''
+        Stops every axis, even if stopping one of them fails.
+
+        raises: the first error raised while stopping an axis
+        '''
+        error = None
+        for motor in self.motors:
+            try:
+                motor.stop(blocking=False)
+            except Exception as err:
+                error = error or err
+        if error is not None:
+            raise error
+        if blocking:
+            self.wait_move_finish(.01)
+
+    def scan(self, points, settle_time=0., interval=.01):
+        '''
+        Visits each point in order, yielding once the stage has settled
+        there. The whole path is checked against the limits first.
+
+        points: 2DArray of positions (points x axes), in meters, e.g.
+        from raster_path()
+        settle_time: time to wait after each move, in seconds
+        interval: polling interval while moving, in seconds
+
+        yields: the current point
+        raises: ValueError if points do not have one column per axis
+        raises: StageOutOfBoundsException if any point is out of bounds
+        '''
+        points = np.atleast_2d(points)
+        self._check_axes(points, 'points', ndim=2)
+        self.check_limits(points)
+        for point in points:
+            self.move_abs(point)
+            self.wait_move_finish(interval)
+            if settle_time:
+                sleep(settle_time)
+            yield point
+
+    def close(self) -> None:
+        for motor in self.motors:
+            motor.close()
+
+
+def raster_path(axes, serpentine=True, velocities=None, settle_time=0., start=None) -> np.ndarray:
+    '''
+    Orders the points of a grid for a scan with MotorGroup.scan().
+
+    Every nesting order of the axes is evaluated, with rows traversed in
+    alternating directions if serpentine, and the path with the least
+    move time is returned. Axes move concurrently, so a move takes as
+    long as its slowest axis.
+
+    axes: list of positions along each axis, in meters
+    serpentine: True to reverse every other row instead of returning to
+    the start of the row
+    velocities: speed of each axis (default: equal speeds)
+    settle_time: time to settle after each move, in seconds
+    start: current location of each axis, to also choose the direction
+    the path is traversed in
+
+    returns: 2DArray of positions (points x axes), in meters
+    '''
+    axes = [np.asarray(axis, dtype=np.float64) for axis in axes]
+    velocities = np.ones(len(axes)) if velocities is None else np.asarray(velocities)
+
+    best, best_cost = None, np.inf
+    for order in permutations(range(len(axes))):
+        index = _grid_indices([len(axes[axis]) for axis in order], serpentine)
+        path = np.empty((len(index), len(axes)))
+        for level, axis in enumerate(order):
+            path[:, axis] = axes[axis][index[:, level]]
+        candidates = [path] if start is None else [path, path[::-1]]
+        for candidate in candidates:
+            cost = _path_time(candidate, velocities, settle_time, start)
+            if cost < best_cost:
+                best, best_cost = candidate, cost
+    return best
+
+
+def _grid_indices(sizes, serpentine) -> np.ndarray:
+    '''Grid indices (points x levels), outermost level first.'''
+    index = np.arange(sizes[-1])[:, None]
+    for size in reversed(sizes[:-1]):
+        rows = [index[::-1] if (serpentine and i % 2) else index for i in range(size)]
+        index = np.concatenate([np.column_stack([np.full(len(row), i), row])
+                                for i, row in enumerate(rows)])
+    return index
+
+
+def _path_time(path, velocities, settle_time, start) -> float:
+    if start is not None:
+        path = np.vstack([start, path])
+    steps = np.abs(np.diff(path, axis=0)) / velocities
+    moves = steps.max(axis=1)
+    return moves.sum() + settle_time * np.count_nonzero(moves)
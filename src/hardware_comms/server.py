@@ -0,0 +1,435 @@
+from concurrent.futures import Future
+from multiprocessing import resource_tracker
+from multiprocessing.shared_memory import SharedMemory
+import inspect
+import ipaddress
+import json
+import os
+import pickle
+import socket
+import socketserver
+import struct
+import threading
+import time
+
+from .devices import Device, DeviceCommsException
+
+'''
+Local server for sharing devices between processes.
+
+A DeviceServer owns Device instances and serves them over a Unix socket
+(or a localhost TCP port where Unix sockets are unavailable). A
+DeviceProxy connects to one of the served devices and exposes the same
+properties and methods as the local driver.
+
+Requests have a fixed format: the operation, device and attribute names
+as UTF-8 and the arguments as JSON, so the server never unpickles data
+from clients. numpy arrays and tuples in the arguments arrive as lists.
+
+Responses are pickled with protocol 5, so numpy arrays are sent as
+out-of-band buffers straight from their memory. Buffers larger than
+shm_threshold are passed through a shared memory segment owned by the
+server connection instead of the socket. Only connect to servers you
+trust, since responses are unpickled.
+
+TCP servers only accept loopback addresses, but any local user can
+still connect to them and operate the devices.
+'''
+
+_OPERATIONS = ('describe', 'get', 'set', 'call')
+# operation, length of device name, attribute name and JSON arguments
+_REQUEST = struct.Struct('!BHHI')
+_MAX_ARGUMENTS = 1 << 24
+# payload length, number of buffers, length of shared memory name
+_HEADER = struct.Struct('!IHH')
+# buffer location (socket or shared memory), offset, length
+_DESCRIPTOR = struct.Struct('!BQQ')
+_INLINE = 0
+_SHARED = 1
+
+
+class DeviceServer:
+    '''
+    Serves devices to DeviceProxy clients.
+
+    devices: dict of {name: Device} served by this server. The server
+    owns the devices and closes them in .close()
+    address: path of the Unix socket, or a (host, port) tuple for TCP.
+    The host must resolve to a loopback address.
+    coalesce_window: time, in seconds, for which a property read is
+    reused by other clients. Concurrent reads of the same property are
+    always coalesced into a single device query.
+    shm_threshold: arrays of at least this many bytes are sent through
+    shared memory
+    '''
+
+    def __init__(self, devices: dict, address, coalesce_window=0.,
+                 shm_threshold=1 << 18):
+        self.devices = {name: _ServedDevice(device, coalesce_window)
+                        for name, device in devices.items()}
+        self.address = address
+        self.shm_threshold = shm_threshold
+        if isinstance(address, str):
+            server_class = socketserver.ThreadingUnixStreamServer
+        else:
+            _check_loopback(address)
+            server_class = socketserver.ThreadingTCPServer
+        self._server = server_class(address, _Handler)
+        self._server.daemon_threads = True
+        self._server.owner = self
+
+    def serve_forever(self) -> None:
+        '''Handles client requests until .shutdown() is called.'''
+        self._server.serve_forever()
+
+    def shutdown(self) -> None:
+        '''Stops serve_forever, call from another thread.'''
+        self._server.shutdown()
+
+    def close(self) -> None:
+        '''Closes the socket and all served devices.'''
+        self._server.server_close()
+        if isinstance(self.address, str) and os.path.exists(self.address):
+            os.unlink(self.address)
+        for served in self.devices.values():
+            served.device.close()
+
+    def dispatch(self, request):
+        '''
+        Executes a single client request.
+
+        request: tuple of (operation, device name, attribute name, args,
+        kwargs), where operation is one of describe, get, set or call
+        returns: result of the operation
+        '''
+        op, device, name, args, kwargs = request
+        try:
+            served = self.devices[device]
+        except KeyError:
+            raise DeviceCommsException(f"No device named {device}")
+        if name.startswith('_'):
+            raise AttributeError(f"{name} is private")
+        if op == 'describe':
+            return served.describe()
+        elif op == 'get':
+            return served.get(name)
+        elif op == 'set':
+            return served.set(name, args[0])
+        elif op == 'call':
+            return served.call(name, args, kwargs)
+        raise DeviceCommsException(f"Unknown operation {op}")
+
+
+class DeviceProxy:
+    '''
+    Client side of a device served by DeviceServer, with the same
+    interface as the local driver. Generators, such as
+    YokogawaOSA.stream_repeat, cannot be served.
+
+    .close() only disconnects from the server, the device stays open.
+
+    address: address of the DeviceServer
+    name: name of the device on the server
+    '''
+
+    def __init__(self, address, name):
+        if not isinstance(address, str):
+            _check_loopback(address)
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.connect(address)
+        object.__setattr__(self, '_sock', sock)
+        object.__setattr__(self, '_name', name)
+        object.__setattr__(self, '_lock', threading.Lock())
+        object.__setattr__(self, '_segments', {})
+        object.__setattr__(self, '_interface', self._request('describe', ''))
+
+    def _request(self, op, name, *args, **kwargs):
+        with self._lock:
+            _send_request(self._sock, op, self._name, name, args, kwargs)
+            ok, value = _recv(self._sock, self._segments)
+        if not ok:
+            raise value
+        return value
+
+    def __getattr__(self, name):
+        if name.startswith('_'):
+            raise AttributeError(name)
+        if name in self._interface['properties'] or name in self._interface['attributes']:
+            return self._request('get', name)
+        if name in self._interface['methods']:
+            def method(*args, **kwargs):
+                return self._request('call', name, *args, **kwargs)
+            method.__name__ = name
+            return method
+        raise AttributeError(f"{self._interface['class']} has no attribute {name}")
+
+    def __setattr__(self, name, value):
+        if name in self._interface['properties'] or name in self._interface['attributes']:
+            self._request('set', name, value)
+        else:
+            object.__setattr__(self, name, value)
+
+    def __dir__(self):
+        return [*object.__dir__(self), *self._interface['properties'],
+                *self._interface['attributes'], *self._interface['methods']]
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self) -> None:
+        self._sock.close()
+        for shm in self._segments.values():
+            shm.close()
+        self._segments.clear()
+
+
+class _ServedDevice:
+    '''
+    A device with a lock serializing access to it, and the state for
+    coalescing property reads.
+    '''
+
+    def __init__(self, device: Device, coalesce_window):
+        self.device = device
+        self.coalesce_window = coalesce_window
+        self.lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._inflight = {}
+        self._cache = {}
+        self._generation = 0
+
+    def describe(self) -> dict:
+        properties, methods, attributes = [], [], []
+        for name, attr in inspect.getmembers(type(self.device)):
+            if name.startswith('_'):
+                continue
+            if isinstance(attr, property):
+                properties.append(name)
+            elif callable(attr):
+                methods.append(name)
+            else:
+                attributes.append(name)
+        attributes += [name for name in vars(self.device)
+                       if not name.startswith('_') and name not in attributes]
+        return {'class': type(self.device).__name__, 'properties': properties,
+                'methods': methods, 'attributes': attributes}
+
+    def get(self, name):
+        with self._state_lock:
+            cached = self._cache.get(name)
+            if cached is not None and time.monotonic() - cached[0] <= self.coalesce_window:
+                return cached[1]
+            pending = self._inflight.get(name)
+            leader = pending is None
+            if leader:
+                pending = self._inflight[name] = Future()
+                generation = self._generation
+        if not leader:
+            return pending.result()
+
+        try:
+            with self.lock:
+                value = getattr(self.device, name)
+        except Exception as err:
+            pending.set_exception(err)
+        else:
+            pending.set_result(value)
+        finally:
+            with self._state_lock:
+                del self._inflight[name]
+                if (pending.exception() is None and self.coalesce_window > 0
+                        and generation == self._generation):
+                    self._cache[name] = (time.monotonic(), pending.result())
+        return pending.result()
+
+    def set(self, name, value):
+        with self.lock:
+            setattr(self.device, name, value)
+            self._invalidate()
+
+    def call(self, name, args, kwargs):
+        with self.lock:
+            result = getattr(self.device, name)(*args, **kwargs)
+            self._invalidate()
+        if inspect.isgenerator(result):
+            result.close()
+            raise DeviceCommsException(f"{name} returns a generator and cannot be served")
+        return result
+
+    def _invalidate(self):
+        with self._state_lock:
+            self._cache.clear()
+            self._generation += 1
+
+
+class _Handler(socketserver.BaseRequestHandler):
+    def handle(self):
+        owner = self.server.owner
+        shared = _SharedBuffer()
+        try:
+            while True:
+                try:
+                    request = _recv_request(self.request)
+                except ConnectionError:
+                    break
+                try:
+                    if isinstance(request, Exception):
+                        raise request
+                    response = (True, owner.dispatch(request))
+                except Exception as err:
+                    response = (False, err)
+                try:
+                    _send(self.request, response, shared, owner.shm_threshold)
+                except (pickle.PicklingError, TypeError, AttributeError) as err:
+                    _send(self.request, (False, DeviceCommsException(
+                        f"Response could not be serialized: {err}")))
+        finally:
+            shared.close()
+
+
+class _SharedBuffer:
+    '''Shared memory segment of a connection, grown as needed.'''
+
+    def __init__(self):
+        self.shm = None
+
+    def reserve(self, nbytes) -> SharedMemory:
+        if self.shm is None or self.shm.size < nbytes:
+            self.close()
+            self.shm = SharedMemory(create=True, size=nbytes)
+        return self.shm
+
+    def close(self):
+        if self.shm is not None:
+            self.shm.close()
+            self.shm.unlink()
+            self.shm = None
+
+
+def _check_loopback(address):
+    host, port = address[:2]
+    for info in socket.getaddrinfo(host, port, socket.AF_INET, socket.SOCK_STREAM):
+        if not ipaddress.ip_address(info[4][0]).is_loopback:
+            raise ValueError(f"{host} is not a loopback address")
+
+
+def _to_json(obj):
+    # numpy arrays and scalars
+    if hasattr(obj, 'tolist'):
+        return obj.tolist()
+    raise TypeError(f"{type(obj).__name__} cannot be sent to the server")
+
+
+def _send_request(sock, op, device, name, args, kwargs):
+    device = device.encode()
+    name = name.encode()
+    arguments = json.dumps({'args': args, 'kwargs': kwargs}, default=_to_json).encode()
+    sock.sendall(b''.join([_REQUEST.pack(_OPERATIONS.index(op), len(device),
+                                         len(name), len(arguments)),
+                           device, name, arguments]))
+
+
+def _recv_request(sock):
+    '''
+    Reads one request from a client.
+
+    returns: (operation, device, name, args, kwargs), or a
+    DeviceCommsException if the request is malformed
+    raises: ConnectionError if the connection is closed or the request
+    is too large to read
+    '''
+    op, device_len, name_len, arguments_len = _REQUEST.unpack(
+        _recv_exact(sock, _REQUEST.size))
+    if arguments_len > _MAX_ARGUMENTS:
+        raise ConnectionError("Request too large")
+    device = _recv_exact(sock, device_len)
+    name = _recv_exact(sock, name_len)
+    arguments = _recv_exact(sock, arguments_len)
+    try:
+        arguments = json.loads(arguments)
+        return (_OPERATIONS[op], device.decode(), name.decode(),
+                tuple(arguments['args']), dict(arguments['kwargs']))
+    except (ValueError, IndexError, KeyError, TypeError) as err:
+        return DeviceCommsException(f"Malformed request: {err}")
+
+
+def _send(sock, obj, shared=None, shm_threshold=None):
+    buffers = []
+    payload = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+    views = [buffer.raw() for buffer in buffers]
+
+    kinds = [_INLINE] * len(views)
+    if shared is not None:
+        kinds = [_SHARED if view.nbytes >= shm_threshold else _INLINE for view in views]
+    shm_bytes = sum(view.nbytes for view, kind in zip(views, kinds) if kind == _SHARED)
+    name = b''
+    if shm_bytes:
+        shm = shared.reserve(shm_bytes)
+        name = shm.name.encode()
+
+    descriptors = []
+    offset = 0
+    for view, kind in zip(views, kinds):
+        if kind == _SHARED:
+            shm.buf[offset:offset + view.nbytes] = view
+            descriptors.append(_DESCRIPTOR.pack(kind, offset, view.nbytes))
+            offset += view.nbytes
+        else:
+            descriptors.append(_DESCRIPTOR.pack(kind, 0, view.nbytes))
+
+    sock.sendall(b''.join([_HEADER.pack(len(payload), len(views), len(name)),
+                           *descriptors, name, payload]))
+    for view, kind in zip(views, kinds):
+        if kind == _INLINE:
+            sock.sendall(view)
+
+
+def _recv(sock, segments):
+    payload_len, n_buffers, name_len = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    descriptors = [_DESCRIPTOR.unpack(_recv_exact(sock, _DESCRIPTOR.size))
+                   for _ in range(n_buffers)]
+    name = _recv_exact(sock, name_len).decode()
+    payload = _recv_exact(sock, payload_len)
+
+    buffers = []
+    for kind, offset, length in descriptors:
+        if kind == _INLINE:
+            buffers.append(_recv_exact(sock, length))
+        else:
+            shm = _attach(name, segments)
+            buffers.append(bytearray(shm.buf[offset:offset + length]))
+    return pickle.loads(payload, buffers=buffers)
+
+
+def _recv_exact(sock, nbytes) -> bytearray:
+    data = bytearray(nbytes)
+    view = memoryview(data)
+    received = 0
+    while received < nbytes:
+        count = sock.recv_into(view[received:])
+        if count == 0:
+            raise ConnectionError("Connection closed")
+        received += count
+    return data
+
+
+def _attach(name, segments) -> SharedMemory:
+    '''Attaches to the server's segment, closing replaced segments.'''
+    if name in segments:
+        return segments[name]
+    for shm in segments.values():
+        shm.close()
+    segments.clear()
+    try:
+        shm = SharedMemory(name=name, track=False)
+    except TypeError:
+        # before python 3.13 the segment would be unlinked when the client exits
+        shm = SharedMemory(name=name)
+        if os.name == 'posix':
+            resource_tracker.unregister(shm._name, 'shared_memory')
+    segments[name] = shm
+    return shm
@@ -1,26 +1,42 @@
 from .spectrometer import Spectrometer,SpectrometerIntegrationException, SpectrometerAverageException
+from .spectrum import Spectrum, wavelength_axis
 
 from seabreeze.spectrometers import Spectrometer as ooSpec
+from seabreeze.spectrometers import SeaBreezeError
 import seabreeze
 import numpy as np
 seabreeze.use('cseabreeze')
 
 
 class OceanOpticsSpectrometer(Spectrometer):
+    retry_errors = (SeaBreezeError,)
+
     def __init__(self, how='first'):
+        self._how = how
         if how == 'first':
             self.spectrometer = ooSpec.from_first_available()
+        # reopen the same unit, even if others were plugged in since
+        self._serial = self.spectrometer.serial_number
 
     def intensities(self):
-        return self.spectrometer.intensities()
+        return self.call_with_retries(lambda: self.spectrometer.intensities())
 
     def wavelengths(self):
         return self.spectrometer.wavelengths() * 1e-9
 
+    @property
+    def wavelength_axis(self):
+        '''Read-only wavelength bins (in meters) shared by all spectra.'''
+        try:
+            return self._wavelength_axis
+        except AttributeError:
+            self._wavelength_axis = wavelength_axis(self.wavelengths())
+            return self._wavelength_axis
+
     def spectrum(self):
-        spectrum = self.spectrometer.spectrum()
-        spectrum[0,:] = spectrum[0,:] *1e-9
-        return spectrum
+        return Spectrum(self.wavelength_axis, self.intensities(),
+                        integration_time=getattr(self, '_integration_time', None),
+                        dtype=self.spectrum_dtype)
 
     @property
     def integration_time(self):
@@ -65,5 +81,15 @@ class OceanOpticsSpectrometer(Spectrometer):
     def idn(self):
         return self.spectrometer.serial_number
 
+    def reopen(self):
+        try:
+            self.spectrometer.close()
+        except SeaBreezeError:
+            pass
+        self.spectrometer = ooSpec.from_serial_number(self._serial)
+        integration_time = getattr(self, '_integration_time', None)
+        if integration_time is not None:
+            self.spectrometer.integration_time_micros(integration_time * 1e6)
+
     def close(self):
-        self.spectrometer.close()
\ No newline at end of file
+        self.spectrometer.close()
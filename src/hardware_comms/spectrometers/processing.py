@@ -0,0 +1,198 @@
+from abc import ABC, abstractmethod
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+from .analysis import LOG_SCALES, LINEAR_SCALES
+
+'''
+Composable post-processing of spectra. Every stage operates on a whole
+batch of frames (frames x pixels) at once, so that the output of
+Spectrometer.spectrum() or YokogawaOSA.spectrum() can be stacked and
+processed without per-frame Python loops.
+'''
+
+
+class ProcessingStage(ABC):
+    '''
+    Abstract class for a single processing stage. Implement this with a
+    subclass for new corrections.
+    '''
+    @abstractmethod
+    def __call__(self, frames: np.ndarray) -> np.ndarray:
+        '''
+        Applies the stage to a batch of frames.
+
+        frames: 2DArray of shape (frames, pixels)
+        returns: 2DArray of shape (frames, output pixels)
+        '''
+        pass
+
+
+class DarkSubtraction(ProcessingStage):
+    '''
+    Subtracts a dark frame from every frame in the batch.
+    '''
+
+    def __init__(self, dark):
+        self.dark = np.asarray(dark, dtype=np.float64)
+
+    def __call__(self, frames):
+        return frames - self.dark
+
+
+class NonlinearityCorrection(ProcessingStage):
+    '''
+    Detector nonlinearity correction, counts / P(counts), where P is the
+    polynomial with ascending coefficients (c0, c1, ...) as stored in
+    Ocean Optics spectrometers.
+    '''
+
+    def __init__(self, coefficients):
+        self.coefficients = np.asarray(coefficients, dtype=np.float64)
+
+    def __call__(self, frames):
+        return frames / np.polynomial.polynomial.polyval(frames, self.coefficients)
+
+
+class ToWatts(ProcessingStage):
+    '''
+    Converts levels to linear units (W or W/nm).
+
+    unit: level unit or scale of the input frames, one of
+    YokogawaOSA.unit_map or scale_map values. Frames already in linear
+    units are passed through.
+    raises: ValueError if the unit is not recognized
+    '''
+
+    def __init__(self, unit='dBm'):
+        if unit not in LOG_SCALES + LINEAR_SCALES:
+            raise ValueError(f"Unrecognized level unit {unit}")
+        self.unit = unit
+
+    def __call__(self, frames):
+        if self.unit in LINEAR_SCALES:
+            return frames
+        return 1e-3 * np.power(10., frames / 10.)
+
+
+class ToDbm(ProcessingStage):
+    '''
+    Converts levels to logarithmic units (dBm or dBm/nm).
+
+    unit: level unit or scale of the input frames, one of
+    YokogawaOSA.unit_map or scale_map values. Frames already in
+    logarithmic units are passed through.
+    raises: ValueError if the unit is not recognized
+    '''
+
+    def __init__(self, unit='W'):
+        if unit not in LOG_SCALES + LINEAR_SCALES:
+            raise ValueError(f"Unrecognized level unit {unit}")
+        self.unit = unit
+
+    def __call__(self, frames):
+        if self.unit in LOG_SCALES:
+            return frames
+        with np.errstate(divide='ignore'):
+            return 10. * np.log10(frames * 1e3)
+
+
+class Resample(ProcessingStage):
+    '''
+    Linear interpolation from a source wavelength grid onto a target grid.
+    The interpolation indices and weights are computed once, so each
+    batch costs two gathers and a multiply-add.
+
+    source: ascending wavelength bins of the input frames
+    target: wavelength bins of the output frames
+    fill: value for target bins outside of the source grid
+    '''
+
+    def __init__(self, source, target, fill=np.nan):
+        source = np.asarray(source, dtype=np.float64)
+        target = np.asarray(target, dtype=np.float64)
+        upper = np.clip(np.searchsorted(source, target), 1, len(source) - 1)
+        lower = upper - 1
+        self.lower = lower
+        self.upper = upper
+        self.weights = (target - source[lower]) / (source[upper] - source[lower])
+        self.outside = (target < source[0]) | (target > source[-1])
+        self.fill = fill
+
+    def __call__(self, frames):
+        resampled = frames[:, self.lower] * (1. - self.weights) \
+            + frames[:, self.upper] * self.weights
+        resampled[:, self.outside] = self.fill
+        return resampled
+
+
+class Pipeline:
+    '''
+    Ordered chain of processing stages.
+
+    Call the pipeline directly on a (frames x pixels) batch, or use
+    .run() to fan large batches out to a process pool. Stages are pickled
+    once per worker task; frames are passed through shared memory.
+    '''
+
+    def __init__(self, *stages: ProcessingStage):
+        self.stages = list(stages)
+
+    def __call__(self, frames) -> np.ndarray:
+        frames = np.atleast_2d(np.asarray(frames, dtype=np.float64))
+        for stage in self.stages:
+            frames = stage(frames)
+        return frames
+
+    def run(self, frames, processes=None, chunk_size=1024) -> np.ndarray:
+        '''
+        Processes a batch, splitting it over a process pool if it is
+        larger than chunk_size frames.
+
+        frames: 2DArray of shape (frames, pixels)
+        processes: number of worker processes (default: os.cpu_count())
+        chunk_size: number of frames handed to each worker task
+
+        returns: 2DArray of shape (frames, output pixels)
+        '''
+        frames = np.atleast_2d(np.asarray(frames, dtype=np.float64))
+        n_frames = frames.shape[0]
+        if n_frames <= chunk_size:
+            return self(frames)
+
+        out_pixels = self(frames[:1]).shape[1]
+        out_shape = (n_frames, out_pixels)
+        shm_in = SharedMemory(create=True, size=frames.nbytes)
+        shm_out = SharedMemory(create=True, size=n_frames * out_pixels * 8)
+        try:
+            np.ndarray(frames.shape, np.float64, shm_in.buf)[:] = frames
+            with ProcessPoolExecutor(processes) as pool:
+                tasks = [pool.submit(_run_chunk, self,
+                                     shm_in.name, frames.shape,
+                                     shm_out.name, out_shape,
+                                     start, min(start + chunk_size, n_frames))
+                         for start in range(0, n_frames, chunk_size)]
+                for task in tasks:
+                    task.result()
+            result = np.ndarray(out_shape, np.float64, shm_out.buf).copy()
+        finally:
+            for shm in (shm_in, shm_out):
+                shm.close()
+                shm.unlink()
+        return result
+
+
+def _run_chunk(pipeline, in_name, in_shape, out_name, out_shape, start, stop):
+    shm_in = SharedMemory(name=in_name)
+    shm_out = SharedMemory(name=out_name)
+    try:
+        frames = np.ndarray(in_shape, np.float64, shm_in.buf)
+        out = np.ndarray(out_shape, np.float64, shm_out.buf)
+        out[start:stop] = pipeline(frames[start:stop])
+        # drop the views before closing the segments
+        del frames, out
+    finally:
+        shm_in.close()
+        shm_out.close()
@@ -3,11 +3,16 @@ from ..devices import Device
 from abc import abstractmethod
 import numpy as np
 
+from .spectrum import Spectrum
+
 class Spectrometer(Device):
 
     '''
     Abstract class for spectrometers
     '''
+    # dtype of the intensities returned by spectrum()
+    spectrum_dtype = np.float64
+
     @abstractmethod
     def intensities(self) -> np.ndarray[np.float64]:
         '''
@@ -27,11 +32,16 @@ class Spectrometer(Device):
         pass
 
     @abstractmethod
-    def spectrum(self) -> np.ndarray[np.float64]:
+    def spectrum(self) -> Spectrum:
         '''
-        Returns a 2-D list of the wavelengths (0) and intensities (1)
+        Returns a Spectrum of the wavelengths (0) and intensities (1),
+        stored as spectrum_dtype on a wavelength axis shared between calls.
+
+        Unlike the 2-D array returned before, the wavelength row is
+        read-only: s[0, :] = ... and in-place operators on the whole
+        spectrum raise ValueError. Modify s[1] or use np.array(s).
 
-        returns: 2DArray where,
+        returns: Spectrum, array-like where,
                 [0] = wavelengths
                 [1] = intensities
         '''
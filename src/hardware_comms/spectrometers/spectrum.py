@@ -0,0 +1,180 @@
+import time
+
+import numpy as np
+from numpy.lib.mixins import NDArrayOperatorsMixin
+
+'''
+Lightweight containers for spectra. The wavelength axis is a read-only
+array shared by reference between frames, so only the intensities are
+stored per frame.
+'''
+
+
+def wavelength_axis(wavelengths) -> np.ndarray:
+    '''
+    Returns wavelengths as a read-only float64 array which can be shared
+    between spectra. Arrays which are already read-only are returned as is.
+    '''
+    if isinstance(wavelengths, np.ndarray) and wavelengths.dtype == np.float64 \
+            and not wavelengths.flags.writeable:
+        return wavelengths
+    axis = np.array(wavelengths, dtype=np.float64)
+    axis.flags.writeable = False
+    return axis
+
+
+class Spectrum(NDArrayOperatorsMixin):
+    '''
+    A single spectrum. Behaves like the 2-D array returned by spectrum()
+    before, where [0] = wavelengths and [1] = intensities. Operators,
+    numpy functions and ndarray methods (s.max(), s.astype(), ...) return
+    plain ndarrays.
+
+    The wavelength row is shared and read-only: item assignment and
+    in-place operators only work on the intensities row (s[1]). Assign
+    a new axis with s.wavelengths = wavelength_axis(...) instead.
+
+    wavelengths: wavelength bins, shared by reference if already read-only
+    intensities: intensity of each bin
+    timestamp: acquisition time, in seconds since the epoch (default: now)
+    integration_time: integration time, in seconds
+    dtype: dtype of the stored intensities
+    '''
+    __slots__ = ('wavelengths', 'intensities', 'timestamp', 'integration_time')
+
+    def __init__(self, wavelengths, intensities, timestamp=None,
+                 integration_time=None, dtype=np.float64):
+        self.wavelengths = wavelength_axis(wavelengths)
+        self.intensities = np.asarray(intensities, dtype=dtype)
+        self.timestamp = time.time() if timestamp is None else timestamp
+        self.integration_time = integration_time
+
+    def __array__(self, dtype=None, copy=None):
+        if copy is False:
+            raise ValueError("Spectrum cannot be converted to an array without a copy")
+        data = np.array([self.wavelengths, self.intensities])
+        if dtype is not None:
+            data = data.astype(dtype, copy=False)
+        return data
+
+    def __array_ufunc__(self, ufunc, method, *inputs, **kwargs):
+        if any(isinstance(out, Spectrum) for out in kwargs.get('out', ())):
+            raise ValueError("The wavelength axis is read-only, modify the "
+                             "intensities (s[1]) in place instead")
+        inputs = tuple(np.asarray(x) if isinstance(x, Spectrum) else x for x in inputs)
+        return getattr(ufunc, method)(*inputs, **kwargs)
+
+    @property
+    def shape(self) -> tuple:
+        return (2, len(self.wavelengths))
+
+    @property
+    def ndim(self) -> int:
+        return 2
+
+    @property
+    def dtype(self) -> np.dtype:
+        return np.result_type(self.wavelengths, self.intensities)
+
+    @property
+    def T(self) -> np.ndarray:
+        return np.asarray(self).T
+
+    def copy(self) -> np.ndarray:
+        '''returns: the spectrum as a new 2-D array'''
+        return np.array(self)
+
+    def __getattr__(self, name):
+        # remaining ndarray attributes (max, mean, astype, tolist, size...)
+        # act on the 2-D array. Private names and unset slots are not
+        # forwarded, which would recurse while unpickling.
+        if name.startswith('_') or name in Spectrum.__slots__:
+            raise AttributeError(
+                f"'{type(self).__name__}' object has no attribute '{name}'")
+        return getattr(np.asarray(self), name)
+
+    def __len__(self):
+        return 2
+
+    def __iter__(self):
+        yield self.wavelengths
+        yield self.intensities
+
+    def __getitem__(self, key):
+        # rows are returned without building the 2-D array
+        if isinstance(key, (int, np.integer)):
+            return (self.wavelengths, self.intensities)[key]
+        if isinstance(key, tuple) and key and isinstance(key[0], (int, np.integer)):
+            return (self.wavelengths, self.intensities)[key[0]][key[1:]]
+        return np.asarray(self)[key]
+
+    def __setitem__(self, key, value):
+        row, rest = (key[0], key[1:]) if isinstance(key, tuple) and key else (key, ())
+        if isinstance(row, (int, np.integer)) and row in (1, -1):
+            self.intensities[rest if rest else ...] = value
+        else:
+            raise ValueError("The wavelength axis is shared and read-only, assign "
+                             "s.wavelengths = wavelength_axis(...) instead")
+
+    def __repr__(self):
+        return (f"Spectrum({len(self.wavelengths)} bins, "
+                f"timestamp={self.timestamp}, integration_time={self.integration_time})")
+
+
+class SpectrumStack:
+    '''
+    A stack of spectra sharing one wavelength axis. As an array it is
+    the (frames x bins) intensities, the input of processing.Pipeline.
+
+    wavelengths: wavelength bins of every frame
+    intensities: 2DArray of shape (frames, bins)
+    timestamps: acquisition time of each frame
+    integration_times: integration time of each frame
+    '''
+    __slots__ = ('wavelengths', 'intensities', 'timestamps', 'integration_times')
+
+    def __init__(self, wavelengths, intensities, timestamps=None, integration_times=None):
+        self.wavelengths = wavelength_axis(wavelengths)
+        self.intensities = np.atleast_2d(intensities)
+        n_frames = self.intensities.shape[0]
+        self.timestamps = [None] * n_frames if timestamps is None else list(timestamps)
+        self.integration_times = [None] * n_frames if integration_times is None \
+            else list(integration_times)
+
+    @classmethod
+    def from_spectra(cls, spectra):
+        '''
+        Stacks spectra recorded on the same wavelength axis.
+
+        raises: ValueError if the wavelength axes differ
+        '''
+        spectra = list(spectra)
+        axis = spectra[0].wavelengths
+        for spectrum in spectra[1:]:
+            if spectrum.wavelengths is not axis and \
+                    not np.array_equal(spectrum.wavelengths, axis):
+                raise ValueError("Spectra do not share a wavelength axis")
+        return cls(axis, np.stack([s.intensities for s in spectra]),
+                   [s.timestamp for s in spectra],
+                   [s.integration_time for s in spectra])
+
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None or dtype == self.intensities.dtype:
+            return self.intensities.copy() if copy else self.intensities
+        if copy is False:
+            raise ValueError(f"SpectrumStack cannot be converted to {dtype} without a copy")
+        return self.intensities.astype(dtype)
+
+    def __len__(self):
+        return self.intensities.shape[0]
+
+    def __getitem__(self, i) -> Spectrum:
+        return Spectrum(self.wavelengths, self.intensities[i], self.timestamps[i],
+                        self.integration_times[i], dtype=self.intensities.dtype)
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def __repr__(self):
+        return f"SpectrumStack({len(self)} frames, {len(self.wavelengths)} bins)"
@@ -11,16 +11,21 @@ import time
 # 3rd party imports
 import numpy as np
 import pyvisa
-from ..devices import PyvisaDevice
+from ..devices import PyvisaDevice, DeviceTimeoutException
 
 # Astrocomb imports
 from .spectrometer import Spectrometer
+from .spectrum import Spectrum, wavelength_axis
 
 # %% OSA ----------------------------------------------------------------------
 
 
 class YokogawaOSA(PyvisaDevice):
     """Holds Yokogawa OSA's attributes and method library."""
+    # maximum time to wait for the OSA to become free, in seconds
+    sweep_timeout = 600.
+    # dtype of the intensities returned by spectrum()
+    spectrum_dtype = np.float64
 # General Methods
 
     def __init__(self, resource_address):
@@ -92,16 +97,19 @@ class YokogawaOSA(PyvisaDevice):
 
     def spectrum(self):
         ''' 
-        Records existing OSA spectrum
+        Records existing OSA spectrum. The x bins are shared with the
+        previous spectrum while the sweep span is unchanged.
 
-        returns: ndarray[x bins, intensities]
+        returns: Spectrum[x bins, intensities]
         '''
-        y_trace = self.query_list(
-            ':TRAC:DATA:Y? {:}'.format(self.active_trace))
-        x_trace = self.query_list(
-            ':TRAC:DATA:X? {:}'.format(self.active_trace))*1e9
-        data = np.array([x_trace, y_trace])
-        return data
+        trace = self.active_trace
+        y_trace = self.query_list(':TRAC:DATA:Y? {:}'.format(trace))
+        x_trace = self.query_list(':TRAC:DATA:X? {:}'.format(trace))
+        x_trace *= 1e9
+        axis = getattr(self, '_wavelength_axis', None)
+        if axis is None or not np.array_equal(axis, x_trace):
+            axis = self._wavelength_axis = wavelength_axis(x_trace)
+        return Spectrum(axis, y_trace, dtype=self.spectrum_dtype)
 
     def get_new_single(self):
         # Prepare OSA
@@ -115,24 +123,123 @@ class YokogawaOSA(PyvisaDevice):
         data = self.spectrum()
         return data
 
+    def stream_repeat(self, buffer=None, interval=.05, copy_trace=None):
+        '''
+        Puts the OSA in REPeat sweep mode once and yields each new
+        spectrum as soon as its sweep completes. Sweep completion is
+        read from bit 0 of the operation status event register, so
+        sweeps are never restarted between traces. The OSA is aborted
+        when the generator is closed.
+
+        The x bins are read once, after the first sweep, and only the
+        intensities are transferred for every following trace. Changing
+        the span while streaming is not supported.
+
+        The next sweep starts rewriting the active trace as soon as a sweep
+        completes, and the OSA offers no atomic way to capture it. A trace
+        may therefore mix the end of one sweep with the start of the next,
+        in particular for short sweeps. Copying to copy_trace shortens the
+        read window to one command, but the copy is still taken after the
+        completion bit has been polled, so it does not rule this out.
+
+        buffer: optional ndarray of shape (2, npoints) which is
+        refilled with every trace. Allocated if not given.
+        interval: polling interval of the status register, in seconds
+        copy_trace: optional trace the completed sweep is copied to before
+        reading. Its contents are overwritten, its status is set to FIX
+        and restored when the generator is closed.
+
+        yields: buffer[x bins, intensities], overwritten by the next trace
+        '''
+        self.sweep_mode = 'REP'
+        if buffer is None:
+            buffer = np.empty((2, self.npoints))
+        trace = self.active_trace
+        read_trace = trace
+        if copy_trace is not None:
+            if copy_trace == trace:
+                raise ValueError("copy_trace must differ from the active trace")
+            copy_status = self.read_trace_status(copy_trace)
+            self.set_trace_status(copy_trace, "FIX")
+            read_trace = copy_trace
+        x_read = False
+        # clear any stale sweep-complete event before starting
+        self.query(':STATus:OPERation:EVENt?')
+        self.write(':INITiate:IMMediate')
+        try:
+            while True:
+                time.sleep(interval)
+                event = int(self.query(':STATus:OPERation:EVENt?').strip())
+                if not (event & 1):
+                    continue
+                if copy_trace is not None:
+                    self.write(f':TRACe:COPY {trace},{copy_trace}')
+                buffer[1, :] = self.query_list(
+                    ':TRAC:DATA:Y? {:}'.format(read_trace))
+                if not x_read:
+                    buffer[0, :] = self.query_list(
+                        ':TRAC:DATA:X? {:}'.format(read_trace))
+                    buffer[0, :] *= 1e9
+                    x_read = True
+                yield buffer
+        finally:
+            self.write(':ABORt')
+            if copy_trace is not None:
+                self.set_trace_status(copy_trace, copy_status)
+
     def initiate_sweep(self):
         self.write(':INITiate:IMMediate')
         self.__wait_until_free()
 
     def __wait_until_free(self):
+        '''
+        Polls *OPC? until the OSA is free. Timeouts are expected while the
+        OSA is busy and are tolerated until sweep_timeout elapses. I/O
+        errors and closed sessions reopen the resource, up to
+        retry_policy.retries times.
+
+        raises: DeviceTimeoutException if the OSA is still busy after
+        sweep_timeout or the I/O errors persist
+        '''
+        stats = self.failure_stats
+        deadline = time.monotonic() + self.sweep_timeout
+        io_errors = 0
         busy = True
         while busy:
+            if time.monotonic() > deadline:
+                stats.deadlines_exceeded += 1
+                raise DeviceTimeoutException(
+                    f"OSA still busy after {self.sweep_timeout} s")
             time.sleep(.05)
             try:
-                busy = not (int(self.query('*OPC?').strip().split(";")[0]))
-            except pyvisa.VisaIOError as visa_err:
-                if (visa_err.error_code == -1073807339):  # timeout error
-                    pass
-                elif(visa_err.error_code == -1073807298): # i/o error
+                # bypass the retry policy, *OPC? blocks while sweeping
+                busy = not (int(self.resource.query('*OPC?').strip().split(";")[0]))
+            except (pyvisa.VisaIOError, pyvisa.errors.InvalidSession) as visa_err:
+                # a closed session is recovered like an I/O error
+                closed = isinstance(visa_err, pyvisa.errors.InvalidSession)
+                if (not closed and visa_err.error_code == -1073807339):  # timeout error
                     pass
+                elif(closed or visa_err.error_code == -1073807298): # i/o error
+                    stats.failures += 1
+                    stats.last_error = visa_err
+                    io_errors += 1
+                    if io_errors > self.retry_policy.retries:
+                        raise DeviceTimeoutException(
+                            f"OSA I/O error persisted after {io_errors} attempts") from visa_err
+                    if self.retry_policy.reopen:
+                        try:
+                            self.reopen()
+                            stats.reopens += 1
+                        except self.retry_errors as err:
+                            stats.last_error = err
                 else:
                     raise visa_err
 
+    def reopen(self):
+        PyvisaDevice.reopen(self)
+        # write directly, the retry policy may be reopening already
+        self.resource.write('CFORM1')
+
 
 # Set Methods
 